@@ -2,7 +2,6 @@
 
 from collections.abc import Callable
 from functools import partial, update_wrapper
-import inspect
 import threading
 import time
 import weakref
@@ -19,17 +18,35 @@ __all__ = (
     'WaitTimeoutError',
 )
 
+# Same as `inspect.CO_GENERATOR`,
+# which would make us import `inspect` (and with it `ast`, `dis`, ...)
+_CO_GENERATOR = 0x20
+
+# Interval in seconds for re-checking a running generator
+# that we are not notified about
+_WAIT_INTERVAL = 0.01
+
 
 class WaitTimeoutError(RuntimeError):
     """Error class that is raised when a specified timeout is exceeded."""
     pass
 
 
+def _terminated_generator():
+    """Create a generator that has already terminated."""
+    generator = (_ for _ in ())
+    next(generator, None)
+    return generator
+
+
 class GeneratorWrapper(object):
 
     """Wraps a weak reference to a generator and adds convenience features."""
 
-    def __init__(self, weak_generator, catch_stopiteration=True, debug=False):
+    __slots__ = ('weak_generator', 'catch_stopiteration', 'debug', '_lock', '__weakref__')
+
+    def __init__(self, weak_generator, catch_stopiteration=True, debug=False, *,
+                 _lock=None):
         self.weak_generator = weak_generator
         self.catch_stopiteration = catch_stopiteration
         self.debug = debug
@@ -40,20 +57,23 @@ class GeneratorWrapper(object):
         # and WILL succeed,
         # as long as the wrapper is used.
         # This is of course bypassed
-        # by somone calling the generator's methods directly.
-        self._lock = threading.RLock()
+        # by somone calling the generator's methods directly
+        # or through a wrapper with a different lock,
+        # for which waiters fall back to polling.
+        # Wrappers of the same generator instance may share it.
+        # The lock must be reentrant,
+        # because the generator may call its wrapper's methods
+        # while it is being resumed through them
+        # (which then raise or time out rather than deadlock).
+        if _lock is None:
+            _lock = threading.RLock()
+        self._lock = _lock
 
         if self.debug:
             print("new Wrapper created", self)
-
-    def __del__(self):
-        if self.debug:
-            print("Wrapper is being deleted", self)
-
-    @property
-    def _args(self):
-        """Provide a dynamic view of this instance's attributes."""
-        return (self.weak_generator, self.catch_stopiteration, self.debug)
+            # Not a `__del__` method,
+            # so that wrappers without debug output are not finalized
+            weakref.finalize(self, print, "Wrapper is being deleted", repr(self))
 
     @property
     def generator(self):
@@ -62,7 +82,9 @@ class GeneratorWrapper(object):
 
     def with_strong_ref(self):
         """Get a StrongGeneratorWrapper with the same attributes."""
-        return StrongGeneratorWrapper(self.generator, *self._args)
+        return StrongGeneratorWrapper(self.generator, self.weak_generator,
+                                      self.catch_stopiteration, self.debug,
+                                      _lock=self._lock)
 
     def with_weak_ref(self):
         """Get a (Weak)GeneratorWrapper with the same attributes."""
@@ -75,38 +97,79 @@ class GeneratorWrapper(object):
         if self.debug:
             print("waiting for %s to pause" % generator)
 
-        original_timeout = timeout
-        while timeout is None or timeout > 0:
-            last_time = time.time()
-            if self._lock.acquire(False):  # timeout param was added in 3.2
-                try:
-                    if self.can_resume():
-                        return method(generator, *args, **kwargs)
-                    elif self.has_terminated():
-                        raise RuntimeError("%s has already terminated" % generator)
-                finally:
-                    self._lock.release()
-
-            if timeout is not None:
-                timeout -= time.time() - last_time
-
-        msg = "%s did not pause after %ss" % (generator, original_timeout)
+        if timeout is None:
+            deadline = float('inf')
+        else:
+            deadline = time.monotonic() + timeout
+
+        while True:
+            remaining = deadline - time.monotonic()
+            # Block on the lock instead of polling it;
+            # it is released as soon as the generator pauses.
+            # Infinite or huge timeouts are not accepted by `acquire`.
+            if timeout is None or remaining > threading.TIMEOUT_MAX:
+                acquired = self._lock.acquire()
+            else:
+                acquired = self._lock.acquire(timeout=max(remaining, 0))
+            if not acquired:
+                break
+            try:
+                # Same as `has_terminated` and `can_resume`,
+                # but reads the state of the generator we already hold once.
+                if generator is None or generator.gi_frame is None:
+                    raise RuntimeError("%s has already terminated" % generator)
+                if not generator.gi_running:
+                    return method(generator, *args, **kwargs)
+            finally:
+                self._lock.release()
+
+            # The generator is running without holding our lock.
+            # Either it is resumed by a wrapper with a different lock
+            # (e.g. one constructed separately for the generator)
+            # or by calling the generator's methods directly,
+            # or we are called from within the generator
+            # while it is being resumed through a wrapper.
+            # In the latter case, we still hold the outer level of the lock,
+            # so no other thread can resume the generator in the meantime.
+            # Nobody tells us when the generator pauses,
+            # so we check again after a short while.
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, _WAIT_INTERVAL))
+
+        msg = "%s did not pause after %ss" % (generator, timeout)
         if self.debug:
             print(msg)
         raise WaitTimeoutError(msg)
 
+    def _start_thread(self, name, target, *args, **kwargs):
+        """Start a daemon thread that calls 'target'."""
+        thread = threading.Thread(target=target, args=args, kwargs=kwargs)
+        thread.daemon = True
+        if self.debug:
+            print("spawned new thread to call %s_wait: %r" % (name, thread))
+        thread.start()
+        return thread
+
     # The "properties"
+    #
+    # These intentionally build a new partial on every access.
+    # The partial holds a strong reference to the generator
+    # for as long as the callback is alive,
+    # which is what keeps a paused generator from being collected.
+    # Caching it on the wrapper would either keep the generator alive
+    # for the weak wrapper's entire lifetime
+    # or create a reference cycle through the strong wrapper.
     @property
     def next(self):
         """Resume the generator."""
-        return partial(self._next, self.generator)
-
-    __next__ = next  # Python 3
+        return partial(self._send, self.generator, None)
 
-    def _next(self, generator):
-        if self.debug:
-            print("next:", generator)
-        return self._send(generator)
+    def __next__(self):
+        # Called by the `next` builtin immediately,
+        # so there is no need to bind the generator first
+        return self._send(self.generator)
 
     @property
     def next_wait(self):
@@ -114,7 +177,7 @@ class GeneratorWrapper(object):
         return partial(self._next_wait, self.generator)
 
     def _next_wait(self, generator, timeout=None):
-        return self._wait(generator, self._next, timeout)
+        return self._wait(generator, self._send, timeout)
 
     @property
     def next_wait_async(self):
@@ -122,15 +185,7 @@ class GeneratorWrapper(object):
         return partial(self._next_wait_async, self.generator)
 
     def _next_wait_async(self, generator, timeout=None):
-        thread = threading.Thread(
-            target=self._next_wait,
-            args=(generator, timeout)
-        )
-        thread.daemon = True
-        if self.debug:
-            print("spawned new thread to call %s_wait: %r" % ('next', thread))
-        thread.start()
-        return thread
+        return self._start_thread('next', self._next_wait, generator, timeout)
 
     @property
     def send(self):
@@ -141,14 +196,19 @@ class GeneratorWrapper(object):
     def _send(self, generator, value=None):
         if self.debug:
             print("send:", generator, value)
-        with self._lock:
+        if generator is None:
+            # Garbage-collected generators behave like terminated ones
             if self.catch_stopiteration:
-                try:
-                    return generator.send(value)
-                except StopIteration as si:
-                    return si.value
-            else:
+                return None
+            raise StopIteration
+        with self._lock:
+            try:
                 return generator.send(value)
+            except StopIteration as si:
+                # Only consulted once the generator terminates
+                if self.catch_stopiteration:
+                    return si.value
+                raise
 
     @property
     def send_wait(self):
@@ -164,16 +224,8 @@ class GeneratorWrapper(object):
         return partial(self._send_wait_async, self.generator)
 
     def _send_wait_async(self, generator, value=None, timeout=None):
-        thread = threading.Thread(
-            target=self._send_wait,
-            args=(generator,),
-            kwargs={'value': value, 'timeout': timeout}
-        )
-        thread.daemon = True
-        if self.debug:
-            print("spawned new thread to call %s_wait: %r" % ('send', thread))
-        thread.start()
-        return thread
+        return self._start_thread('send', self._send_wait, generator,
+                                  value=value, timeout=timeout)
 
     @property
     def throw(self):
@@ -183,14 +235,18 @@ class GeneratorWrapper(object):
     def _throw(self, generator, *args, **kwargs):
         if self.debug:
             print("throw:", generator, args, kwargs)
+        if generator is None:
+            # Garbage-collected generators behave like terminated ones,
+            # which raise whatever is thrown into them
+            generator = _terminated_generator()
         with self._lock:
-            if self.catch_stopiteration:
-                try:
-                    return generator.throw(*args, **kwargs)
-                except StopIteration as si:
-                    return si.value
-            else:
+            try:
                 return generator.throw(*args, **kwargs)
+            except StopIteration as si:
+                # Only consulted once the generator terminates
+                if self.catch_stopiteration:
+                    return si.value
+                raise
 
     @property
     def throw_wait(self):
@@ -207,21 +263,16 @@ class GeneratorWrapper(object):
         return partial(self._throw_wait_async, self.generator)
 
     def _throw_wait_async(self, *args, **kwargs):
-        thread = threading.Thread(
-            target=self._throw_wait,
-            args=args,
-            kwargs=kwargs
-        )
-        thread.daemon = True
-        if self.debug:
-            print("spawned new thread to call %s_wait: %r" % ('throw', thread))
-        thread.start()
-        return thread
+        return self._start_thread('throw', self._throw_wait, *args, **kwargs)
 
     @property
     def close(self):
         """Equivalent to ``self.generator.close``."""
-        return self.generator.close
+        generator = self.generator
+        if generator is None:
+            # Closing a terminated generator does nothing either
+            generator = _terminated_generator()
+        return generator.close
 
     def has_terminated(self):
         """Check if the wrapped generator has terminated."""
@@ -242,11 +293,23 @@ class GeneratorWrapper(object):
                 and not gen.gi_running
                 and gen.gi_frame is not None)
 
+    def _equal_attributes(self, other):
+        return (self.weak_generator == other.weak_generator
+                and self.catch_stopiteration == other.catch_stopiteration
+                and self.debug == other.debug)
+
     def __eq__(self, other):
+        if self is other:
+            return True
         if type(other) is GeneratorWrapper:
-            return self._args == other._args
+            return self._equal_attributes(other)
         return NotImplemented
 
+    def __hash__(self):
+        # Equal wrappers always share the generator,
+        # while the other attributes may be modified
+        return hash(self.weak_generator)
+
     __call__ = with_strong_ref
 
 
@@ -254,7 +317,7 @@ class StrongGeneratorWrapper(GeneratorWrapper):
 
     """Wraps a generator and adds convenience features."""
 
-    generator = None  # Override property of GeneratorWrapper
+    __slots__ = ('generator',)  # Overrides property of GeneratorWrapper
 
     def __init__(self, generator, weak_generator=None, *args, **kwargs):
         """__init__
@@ -283,14 +346,19 @@ class StrongGeneratorWrapper(GeneratorWrapper):
 
     def with_weak_ref(self):
         """Get a (Weak)GeneratorWrapper with the same attributes."""
-        return GeneratorWrapper(*self._args)
+        return GeneratorWrapper(self.weak_generator, self.catch_stopiteration,
+                                self.debug, _lock=self._lock)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if type(other) is StrongGeneratorWrapper:
             return (self.generator == other.generator
-                    and self._args == other._args)
+                    and self._equal_attributes(other))
         return NotImplemented
 
+    __hash__ = GeneratorWrapper.__hash__
+
     __call__ = with_weak_ref
 
 
@@ -301,7 +369,9 @@ class send_self:  # noqa: N801
     Can be called with parameters or used as a decorator directly.
     """
 
-    # __slots__ = ['func', 'catch_stopiteration', 'finalize_callback', 'debug']
+    # '__dict__' is required for the attributes set by `update_wrapper`
+    __slots__ = ('func', 'catch_stopiteration', 'finalize_callback', 'debug',
+                 '__dict__', '__weakref__')
 
     def __init__(self, func=None, *,
                  catch_stopiteration=True,
@@ -311,16 +381,9 @@ class send_self:  # noqa: N801
         if func is not None:
             self._validate_func(func)
 
-        type_table = [
-            ('catch_stopiteration', bool),
-            ('debug', bool),
-            ('finalize_callback', (Callable, type(None)))
-        ]
-        for name, type_ in type_table:
-            val = locals()[name]
-            if not isinstance(val, type_):
-                raise TypeError("Expected %s for parameter '%s', got %s"
-                                % (type_, name, type(val)))
+        self._check_type('catch_stopiteration', catch_stopiteration, bool)
+        self._check_type('debug', debug, bool)
+        self._check_type('finalize_callback', finalize_callback, (Callable, type(None)))
 
         self.func = func
         self.catch_stopiteration = catch_stopiteration
@@ -331,6 +394,12 @@ class send_self:  # noqa: N801
         if func:
             update_wrapper(self, func)
 
+    @staticmethod
+    def _check_type(name, val, type_):
+        if not isinstance(val, type_):
+            raise TypeError("Expected %s for parameter '%s', got %s"
+                            % (type_, name, type(val)))
+
     def _validate_func(self, func):
         if isinstance(func, staticmethod):
             raise ValueError("Cannot wrap staticmethod - try reversing wrap order")
@@ -338,9 +407,19 @@ class send_self:  # noqa: N801
             raise ValueError("Cannot wrap classmethod - try reversing wrap order")
         elif not callable(func):
             raise TypeError("Decorator must wrap a callable")
-        elif not inspect.isgeneratorfunction(func):
+        elif not self._is_generator_function(func):
             raise ValueError("Callable must be a generator function")
 
+    @staticmethod
+    def _is_generator_function(func):
+        # Like `inspect.isgeneratorfunction`,
+        # but tests the code flags directly
+        # and does not unwrap anything but partials.
+        while isinstance(func, partial):
+            func = func.func
+        code = getattr(func, '__code__', None)
+        return code is not None and bool(code.co_flags & _CO_GENERATOR)
+
     def __call__(self, *args, **kwargs):
         # Second part of decorator usage, i.e. `@send_self() \n def ...`
         if not self.func:
@@ -351,22 +430,28 @@ class send_self:  # noqa: N801
             update_wrapper(self, self.func)
             return self
 
-        # Create generator wrapper to pass a wrapper to the running instance
-        # as the first argument
-        def wrapper():
-            return (yield from self.func(gen_wrapper, *args, **kwargs))
-        generator = wrapper()
+        # Pass a wrapper of the running instance as the first argument.
+        # The generator's code does not run until it is first resumed,
+        # so the wrapper's weak reference can be filled in afterwards.
+        gen_wrapper = GeneratorWrapper(
+            None,
+            self.catch_stopiteration,
+            self.debug
+        )
+        generator = self.func(gen_wrapper, *args, **kwargs)
 
         # Register finalize_callback to be called when the object is gc'ed
         weak_generator = weakref.ref(generator, self.finalize_callback)
+        gen_wrapper.weak_generator = weak_generator
 
+        # Share the lock so that both wrappers wait for each other
         strong_gen_wrapper = StrongGeneratorWrapper(
             generator,
             weak_generator,
             self.catch_stopiteration,
-            self.debug
+            self.debug,
+            _lock=gen_wrapper._lock
         )
-        gen_wrapper = strong_gen_wrapper.with_weak_ref()
         gen_wrapper.next()  # Start the first iteration
         return strong_gen_wrapper
 
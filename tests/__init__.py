@@ -1,5 +1,6 @@
 import threading
 import time
+import weakref
 
 
 DEFAULT_SLEEP = 0.01
@@ -10,10 +11,13 @@ class CustomError(Exception):
 
 
 def defer(callback, *args,
-          sleep=DEFAULT_SLEEP, expected_return=None, call=True,
+          sleep=DEFAULT_SLEEP, expected_return=None, call=True, ready=None,
           **kwargs):
     def func():
         time.sleep(sleep)
+        # Signals that the call is about to be made, not that it was
+        if ready is not None:
+            ready.set()
         if call:
             assert expected_return == callback(*args, **kwargs)
         else:
@@ -24,15 +28,26 @@ def defer(callback, *args,
 
 
 def wait_until_finished(wrapper, timeout=1, sleep=DEFAULT_SLEEP):
-
-    start_time = time.time()
-    while time.time() < start_time + timeout:
+    # Collection of the generator is signalled right away.
+    # Termination of a generator that is still referenced,
+    # e.g. by a StrongGeneratorWrapper, is polled for every `sleep` seconds.
+    generator = wrapper.generator
+    if generator is None:
+        return
+    collected = threading.Event()
+    finalizer = weakref.finalize(generator, collected.set)
+    del generator
+
+    deadline = time.monotonic() + timeout
+    try:
         # Relies on .has_terminated, but shouldn't be a problem
-        if wrapper.has_terminated():
-            return
-        time.sleep(sleep)
-
-    raise RuntimeError("Has not been collected within %ss" % timeout)
+        while not wrapper.has_terminated():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError("Has not been collected within %ss" % timeout)
+            collected.wait(min(sleep, remaining))
+    finally:
+        finalizer.detach()
 
 
 class State(object):
@@ -1,8 +1,9 @@
+import threading
 import time
 
 import pytest
 
-from resumeback import send_self, WaitTimeoutError
+from resumeback import send_self, StrongGeneratorWrapper, WaitTimeoutError
 
 from . import CustomError, defer, wait_until_finished, State
 
@@ -102,7 +103,7 @@ def test_close_generatorexit():
         with pytest.raises(RuntimeError):
             this.close()
         ts.inc()
-        this.next()  # TOCHECK should this run or should the gen close?
+        this.next()  # Like a plain generator, it is still suspended
 
     @send_self
     def func(this):
@@ -115,7 +116,7 @@ def test_close_generatorexit():
 
     wrapper = func().with_weak_ref()
     wait_until_finished(wrapper)
-    assert ts.counter == 3
+    assert ts.counter == 4
 
 
 def test_close_garbagecollected():
@@ -137,16 +138,22 @@ def test_wait():
 
     @send_self(debug=True)
     def func(this):
-        defer(this.next_wait, sleep=0)
-        time.sleep(0.01)
+        # Wait until the deferred thread is about to make the waiting call.
+        # It may still only make it after we paused,
+        # in which case it resumes us without waiting.
+        ready = threading.Event()
+        defer(this.next_wait, sleep=0, ready=ready)
+        assert ready.wait(1)
         yield
 
-        defer(this.send_wait, 0, sleep=0)
-        time.sleep(0.01)
+        ready.clear()
+        defer(this.send_wait, 0, sleep=0, ready=ready)
+        assert ready.wait(1)
         yield
 
-        defer(this.throw_wait, CustomError, sleep=0, timeout=0.1)
-        time.sleep(0.01)
+        ready.clear()
+        defer(this.throw_wait, CustomError, sleep=0, timeout=0.1, ready=ready)
+        assert ready.wait(1)
         with pytest.raises(CustomError):
             yield
 
@@ -188,14 +195,14 @@ def test_wait_timeout():
 
 def test_wait_timeout2():
     ts = State()
-    timeouts = range(1, 18, 8)
+    timeouts = (1, 3)
 
     @send_self
     def func(this, timeout):
-        start = time.time()
+        start = time.monotonic()
         with pytest.raises(WaitTimeoutError):
             this.next_wait(timeout=timeout)
-        assert time.time() - start > timeout
+        assert time.monotonic() - start > timeout
         ts.run = True
         if False:  # Turn into a generator function
             yield
@@ -206,23 +213,76 @@ def test_wait_timeout2():
         ts.run = False
 
 
+def test_wait_timeout_keeps_lock():
+    ts = State()
+
+    @send_self
+    def func(this):
+        # Must not be able to resume us
+        # while we are waiting for ourselves
+        defer(this.send, 1, sleep=0)
+        with pytest.raises(WaitTimeoutError):
+            this.next_wait(timeout=0.05)
+
+        ts.run = yield
+
+    wait_until_finished(func())
+    assert ts.run == 1
+
+
+@pytest.mark.parametrize('timeout', [float('inf'), threading.TIMEOUT_MAX * 2])
+def test_wait_huge_timeout(timeout):
+    ts = State()
+
+    @send_self
+    def func(_):
+        ts.run = yield
+        yield
+
+    wrapper = func()
+    wrapper.send_wait(1, timeout=timeout)
+    assert ts.run == 1
+
+
+def test_wait_other_wrapper():
+    ts = State()
+    running = threading.Event()
+
+    @send_self
+    def func(_):
+        yield
+        running.set()
+        time.sleep(0.05)
+        yield
+        ts.run = True
+
+    wrapper = func()
+    # Does not share the condition of `wrapper`
+    other = StrongGeneratorWrapper(wrapper.generator)
+    defer(wrapper.next, sleep=0)
+    assert running.wait(1)
+
+    start = time.monotonic()
+    other.next_wait(timeout=1)
+    assert time.monotonic() - start < 0.5
+    assert ts.run
+
+
 def test_wait_async():
     ts = State()
 
     @send_self(debug=True)
     def func(this):
+        # The waiting threads cannot resume us before we pause
         this.next_wait_async()
-        time.sleep(0.1)
         yield
 
         val = 567 + id(func)
         this.send_wait_async(val)
-        time.sleep(0.1)
         received = yield
         assert received == val
 
         this.throw_wait_async(CustomError, timeout=0.5)
-        time.sleep(0.1)
         with pytest.raises(CustomError):
             yield
 
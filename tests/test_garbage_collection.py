@@ -5,7 +5,7 @@ import pytest
 
 from resumeback import send_self
 
-from . import defer, wait_until_finished, State
+from . import CustomError, defer, wait_until_finished, State
 
 
 def test_normal_termination():
@@ -65,6 +65,27 @@ def test_weakref_suspended_deferred():
     assert wrapper.generator is None
 
 
+def test_weakref_collected_send():
+    @send_self
+    def func(_):
+        yield
+
+    wrapper = func().with_weak_ref()
+    assert wrapper.generator is None
+    assert wrapper.next() is None
+    assert wrapper.send(1) is None
+
+    with pytest.raises(CustomError):
+        wrapper.throw(CustomError)
+    assert wrapper.close() is None
+
+    wrapper.catch_stopiteration = False
+    with pytest.raises(StopIteration):
+        wrapper.send(1)
+    with pytest.raises(CustomError):
+        wrapper.throw(CustomError)
+
+
 def test_strongref_suspended():
     ts = State()
 
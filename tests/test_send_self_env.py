@@ -1,3 +1,7 @@
+from functools import partial
+import threading
+import time
+
 import pytest
 
 from resumeback import (
@@ -7,7 +11,7 @@ from resumeback import (
 )
 from random import random
 
-from . import CustomError, State
+from . import CustomError, defer, State
 
 
 def test_wrapper_type():
@@ -40,17 +44,17 @@ def test_send_self_return():
     assert ts.run
 
 
+WRAPPED_ATTRIBUTES = ('__doc__', '__name__', '__module__', '__annotations__')
+
+
 def test_wrapping():
     def func():
         """generic docstring"""
         yield  # pragma: no cover
 
-    attributes = ["__%s__" % a
-                  for a in 'doc,name,module,annotations'.split(',')]
-
     for deco in [send_self, send_self(catch_stopiteration=True)]:
         wrapped = deco(func)
-        for attr in attributes:
+        for attr in WRAPPED_ATTRIBUTES:
             if hasattr(wrapped, attr):
                 assert getattr(wrapped, attr) == getattr(func, attr)
 
@@ -58,7 +62,15 @@ def test_wrapping():
             assert wrapped.__wrapped__ is func
 
 
-def test_not_catch_stopiteration():
+@pytest.mark.parametrize(
+    'method, args',
+    [
+        ('next', []),
+        ('send', [11]),
+        ('throw', [CustomError]),
+    ]
+)
+def test_not_catch_stopiteration(method, args):
     @send_self(catch_stopiteration=False)
     def func(_):
         try:
@@ -67,12 +79,9 @@ def test_not_catch_stopiteration():
             pass
         # Raises StopIteration here
 
-    for meth, args in [('next',  []),
-                       ('send',  [11]),
-                       ('throw', [CustomError])]:
-        w = func()
-        with pytest.raises(StopIteration):
-            getattr(w, meth)(*args)
+    w = func()
+    with pytest.raises(StopIteration):
+        getattr(w, method)(*args)
 
 
 @pytest.mark.parametrize(
@@ -139,6 +148,18 @@ def test_cleanup_yield():
     assert ref() is None
 
 
+def test_partial():
+    ts = State()
+
+    def func(_, param):
+        ts.run = param
+        if False:  # Turn into a generator function
+            yield
+
+    send_self(partial(func, param=True))()
+    assert ts.run
+
+
 def test_parameter():
     ts = State()
     val = ("const", random())
@@ -154,29 +175,29 @@ def test_parameter():
     assert ts.run
 
 
-@pytest.mark.parametrize(
-    'error, func, args, kwargs',
-    [
-        # "func" arg
-        (ValueError, test_parameter, [], {}),
-        (ValueError, lambda x: x ** 2, [], {}),
-        (ValueError, type, [], {}),
-        (TypeError, False, [], {}),
-        (TypeError, None, [1], {}),
-        (TypeError, None, ["str"], {}),
-        # too many args
-        (TypeError, None, [type, 1], {}),
-        # send_self args
-        (TypeError, None, [], {'catch_stopiteration': 1}),
-        (TypeError, None, [], {'finalize_callback': 1}),
-        (TypeError, None, [], {'finalize_callback': False}),
-        (TypeError, None, [], {'debug': 1}),
-        # "delayed" func
-        (TypeError, type, [], {'catch_stopiteration': 1}),
-        (ValueError, type, [], {'catch_stopiteration': True}),
-        (TypeError, 1, [], {'catch_stopiteration': True}),
-    ]
+BAD_ARGUMENTS = (
+    # "func" arg
+    (ValueError, test_parameter, [], {}),
+    (ValueError, lambda x: x ** 2, [], {}),
+    (ValueError, type, [], {}),
+    (TypeError, False, [], {}),
+    (TypeError, None, [1], {}),
+    (TypeError, None, ["str"], {}),
+    # too many args
+    (TypeError, None, [type, 1], {}),
+    # send_self args
+    (TypeError, None, [], {'catch_stopiteration': 1}),
+    (TypeError, None, [], {'finalize_callback': 1}),
+    (TypeError, None, [], {'finalize_callback': False}),
+    (TypeError, None, [], {'debug': 1}),
+    # "delayed" func
+    (TypeError, type, [], {'catch_stopiteration': 1}),
+    (ValueError, type, [], {'catch_stopiteration': True}),
+    (TypeError, 1, [], {'catch_stopiteration': True}),
 )
+
+
+@pytest.mark.parametrize('error, func, args, kwargs', BAD_ARGUMENTS)
 def test_bad_arguments(error, func, args, kwargs):
 
     with pytest.raises(error):
@@ -187,3 +208,62 @@ def test_bad_arguments(error, func, args, kwargs):
 
         assert func is not None  # Otherwise should have raised by now
         ss(func)
+
+
+@pytest.mark.parametrize(
+    'convert',
+    [
+        lambda wrapper, this: wrapper,
+        lambda wrapper, this: this(),
+        lambda wrapper, this: wrapper.with_weak_ref(),
+        lambda wrapper, this: wrapper.with_weak_ref().with_strong_ref(),
+    ],
+    ids=['returned', 'this()', 'weak', 'weak-strong']
+)
+@pytest.mark.parametrize(
+    'method, args',
+    [
+        ('send', [1]),
+        ('send_wait', [1, 1]),
+    ]
+)
+def test_shared_lock(convert, method, args):
+    ts = State()
+    running = threading.Event()
+
+    @send_self
+    def func(this):
+        ts.this = this
+        yield
+        running.set()
+        time.sleep(0.05)
+        ts.run = yield
+
+    wrapper = func()
+    other = convert(wrapper, ts.this)
+    defer(ts.this.next, sleep=0)
+    assert running.wait(1)
+
+    # Blocks until the generator paused
+    # instead of resuming it while it is running
+    getattr(other, method)(*args)
+    assert ts.run == 1
+
+
+def test_generator_identity():
+    ts = State()
+
+    @send_self
+    def func(this):
+        ts.frame_code = this.generator.gi_code
+        if False:  # Turn into a generator function
+            yield
+
+    func()
+    assert ts.frame_code is func.func.__code__
+
+
+def test_co_generator():
+    import inspect
+    import resumeback
+    assert resumeback._CO_GENERATOR == inspect.CO_GENERATOR
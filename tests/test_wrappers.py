@@ -1,8 +1,10 @@
 from __future__ import print_function
 
-import time
+import threading
 import weakref
 
+import pytest
+
 from resumeback import send_self, StrongGeneratorWrapper, GeneratorWrapper
 
 from . import defer, State
@@ -35,7 +37,31 @@ def test_equal():
             != GeneratorWrapper(weakref.ref(generator)))
 
 
-def test_with_weak_ref():
+def test_hash():
+    def func():
+        yield  # pragma: no cover
+    generator = func()
+    strong = StrongGeneratorWrapper(generator)
+    weak = GeneratorWrapper(weakref.ref(generator))
+    assert hash(strong) == hash(StrongGeneratorWrapper(generator))
+    assert hash(weak) == hash(GeneratorWrapper(weakref.ref(generator)))
+
+    wrappers = {strong, weak, strong.with_weak_ref(), weak.with_strong_ref()}
+    assert wrappers == {strong, weak}
+
+
+@pytest.mark.parametrize(
+    'transform',
+    [
+        lambda this: this,
+        lambda this: this.with_weak_ref(),
+        lambda this: this.with_strong_ref().with_weak_ref(),
+        lambda this: this.with_strong_ref().with_strong_ref().with_weak_ref(),
+        lambda this: this()(),
+    ],
+    ids=['this', 'weak', 'strong-weak', 'strong-strong-weak', 'call-call']
+)
+def test_with_weak_ref(transform):
     # Also checks preservance of weak_generator object
     ts = State()
 
@@ -44,23 +70,17 @@ def test_with_weak_ref():
     # unless you specify a callback parameter
     # for either of the constructors.
     # However, even then they compare equal.
-    @send_self(finalize_callback=print)
+    # The callback itself does not matter.
+    @send_self(finalize_callback=lambda ref: None)
     def func(this):
-        thises = [
-            this,
-            this.with_weak_ref(),
-            this.with_strong_ref().with_weak_ref(),
-            this.with_strong_ref().with_strong_ref().with_weak_ref(),
-            this()()
-        ]
+        that = transform(this)
         comp_ref = GeneratorWrapper(weakref.ref(this.generator))
-        for i, that in enumerate(thises):
-            assert type(that) is GeneratorWrapper, i
-            assert that == this
+        assert type(that) is GeneratorWrapper
+        assert that == this
 
-            assert that.weak_generator is this.weak_generator
-            assert comp_ref.weak_generator is not that.weak_generator
-            assert comp_ref.weak_generator == that.weak_generator
+        assert that.weak_generator is this.weak_generator
+        assert comp_ref.weak_generator is not that.weak_generator
+        assert comp_ref.weak_generator == that.weak_generator
         ts.run = True
         if False:  # Turn into a generator function
             yield
@@ -69,29 +89,34 @@ def test_with_weak_ref():
     assert ts.run
 
 
-def test_with_strong_ref():
+@pytest.mark.parametrize(
+    'transform',
+    [
+        lambda this: this,
+        lambda this: this.with_strong_ref(),
+        lambda this: this.with_weak_ref().with_strong_ref(),
+        lambda this: this.with_weak_ref().with_weak_ref().with_strong_ref(),
+        lambda this: this()(),
+    ],
+    ids=['this', 'strong', 'weak-strong', 'weak-weak-strong', 'call-call']
+)
+def test_with_strong_ref(transform):
     ts = State()
 
     # See test_with_weak_ref
-    @send_self(finalize_callback=print)
+    @send_self(finalize_callback=lambda ref: None)
     def func(this):
         this_strong = this.with_strong_ref()
-        thises = [
-            this_strong,
-            this_strong.with_strong_ref(),
-            this_strong.with_weak_ref().with_strong_ref(),
-            this_strong.with_weak_ref().with_weak_ref().with_strong_ref(),
-            this_strong()()
-        ]
+        that = transform(this_strong)
         comp_ref = StrongGeneratorWrapper(this.generator)
-        for i, that in enumerate(thises):
-            assert type(that) is StrongGeneratorWrapper, i
-            assert that == this_strong
-
-            assert that.weak_generator is this.weak_generator
-            assert comp_ref.weak_generator is not that.weak_generator
-            assert comp_ref.weak_generator == that.weak_generator
-        del thises
+        assert type(that) is StrongGeneratorWrapper
+        assert that == this_strong
+
+        assert that.weak_generator is this.weak_generator
+        assert comp_ref.weak_generator is not that.weak_generator
+        assert comp_ref.weak_generator == that.weak_generator
+        del this_strong
+        del that
         del comp_ref
         ts.run = True
         if False:  # Turn into a generator function
@@ -116,10 +141,12 @@ def test_has_terminated_simple():
 
 def test_has_terminated():
     ts = State()
+    resumed = threading.Event()
 
     def cb(this):
         assert not this.has_terminated()
         this.send_wait(True)
+        resumed.set()
 
     @send_self
     def func2(this):
@@ -129,9 +156,51 @@ def test_has_terminated():
         yield
 
     wrapper = func2()
-    time.sleep(0.1)
+    assert resumed.wait(1)
     assert ts.run
 
     assert not wrapper.has_terminated()
     wrapper.next()
     assert wrapper.has_terminated()
+
+
+def test_next_builtin():
+    @send_self(catch_stopiteration=False)
+    def func(this):
+        yield
+        yield 1
+        return 2
+
+    wrapper = func()
+    assert next(wrapper) == 1
+    assert next(wrapper.with_weak_ref(), None) is None
+    assert wrapper.has_terminated()
+
+
+def test_slots():
+    def func():
+        yield  # pragma: no cover
+    generator = func()
+    wrappers = [StrongGeneratorWrapper(generator),
+                GeneratorWrapper(weakref.ref(generator))]
+
+    for wrapper in wrappers:
+        assert not hasattr(wrapper, '__dict__')
+        assert weakref.ref(wrapper)() is wrapper
+
+
+def test_debug_deletion(capsys):
+    def func():
+        yield  # pragma: no cover
+    generator = func()
+    assert not hasattr(GeneratorWrapper, '__del__')
+
+    wrapper = GeneratorWrapper(weakref.ref(generator), debug=True)
+    wrapper_repr = repr(wrapper)
+    del wrapper
+    out = capsys.readouterr().out
+    assert "Wrapper is being deleted %s" % wrapper_repr in out
+
+    wrapper = GeneratorWrapper(weakref.ref(generator))
+    del wrapper
+    assert capsys.readouterr().out == ""